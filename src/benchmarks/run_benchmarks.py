@@ -0,0 +1,305 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from phe import paillier
+
+# Add parent directory to path to import common and client_logic modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Keep audit-log I/O (and its database file) out of the measurements; set before key generation on import
+os.environ["GUARDIAN_AUDIT_DB"] = ""
+
+from common.model_definition import TextComplianceModel
+from client_logic.data_generator import generate_synthetic_text_data, generate_synthetic_image_data, generate_synthetic_sensor_data
+from client_logic.he_utils import encrypt_value, decrypt_value, homomorphic_add_values, homomorphic_multiply_by_scalar
+from client_logic.local_model import preprocess_text_data, preprocess_sensor_data, get_local_insights
+
+DEFAULT_OUTPUT_PATH = os.path.join("data", "benchmarks", "results.json")
+DEFAULT_KEY_SIZES = [1024, 2048]
+DEFAULT_ROW_COUNTS = [1_000, 10_000, 100_000]
+DEFAULT_CLIENT_COUNTS = [3, 10, 30]
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+
+def _time_calls(fn, repeat, number=1):
+    """Runs fn `number` times per sample, `repeat` samples. Returns per-call seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def _peak_memory_mb(fn):
+    """Peak Python heap allocation (MiB) of a single fn() call, measured with tracemalloc."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def _summarize(name, params, samples, items_per_call=1, peak_mb=None):
+    """Builds one result record: latency percentiles plus throughput in items/s."""
+    samples = np.asarray(samples)
+    median = float(np.median(samples))
+    record = {
+        "name": name,
+        "params": params,
+        "repeat": len(samples),
+        "median_s": median,
+        "p90_s": float(np.percentile(samples, 90)),
+        "min_s": float(samples.min()),
+        "throughput_per_s": float(items_per_call / median) if median > 0 else None,
+    }
+    if peak_mb is not None:
+        record["peak_mem_mb"] = float(peak_mb)
+    return record
+
+
+def _case_key(record):
+    params = ",".join(f"{k}={record['params'][k]}" for k in sorted(record["params"]))
+    return f"{record['name']}[{params}]"
+
+
+def _tiled_text_df(num_rows, client_id="bench_client"):
+    """Builds num_rows of synthetic chat data by tiling a small Faker-generated base frame."""
+    base = generate_synthetic_text_data(num_records=min(num_rows, 500), client_id=client_id, compliance_ratio=0.8)
+    reps = int(np.ceil(num_rows / len(base)))
+    return pd.concat([base] * reps, ignore_index=True).iloc[:num_rows]
+
+
+def _tiled_sensor_df(num_rows, client_id="bench_client"):
+    return generate_synthetic_sensor_data(num_points=num_rows, client_id=client_id)
+
+
+def bench_paillier(key_sizes, ops_per_sample, repeat):
+    """Paillier encrypt / add / scalar-mul / decrypt throughput per key size."""
+    results = []
+    for key_size in key_sizes:
+        public_key, private_key = paillier.generate_paillier_keypair(n_length=key_size)
+        values = np.random.uniform(0, 1, ops_per_sample).tolist()
+        ciphertexts = [encrypt_value(v, public_key) for v in values]
+        params = {"key_size": key_size, "ops": ops_per_sample}
+
+        cases = {
+            "paillier_encrypt": lambda: [encrypt_value(v, public_key) for v in values],
+            "paillier_add": lambda: [homomorphic_add_values(c, ciphertexts[0]) for c in ciphertexts],
+            "paillier_scalar_mul": lambda: [homomorphic_multiply_by_scalar(c, 2.5) for c in ciphertexts],
+            "paillier_decrypt": lambda: [decrypt_value(c, private_key) for c in ciphertexts],
+        }
+        for name, fn in cases.items():
+            samples = _time_calls(fn, repeat)
+            results.append(_summarize(name, params, samples, items_per_call=ops_per_sample))
+            print(f"  {name} key={key_size}: {results[-1]['throughput_per_s']:.1f} ops/s")
+    return results
+
+
+def bench_preprocessing(row_counts, repeat):
+    """preprocess_text_data / preprocess_sensor_data throughput by number of rows."""
+    results = []
+    for num_rows in row_counts:
+        text_df = _tiled_text_df(num_rows)
+        sensor_df = _tiled_sensor_df(num_rows)
+        params = {"rows": num_rows}
+
+        cases = {
+            "preprocess_text_data": lambda: preprocess_text_data(text_df),
+            "preprocess_sensor_data": lambda: preprocess_sensor_data(sensor_df),
+        }
+        for name, fn in cases.items():
+            samples = _time_calls(fn, repeat)
+            peak = _peak_memory_mb(fn)
+            results.append(_summarize(name, params, samples, items_per_call=num_rows, peak_mb=peak))
+            print(f"  {name} rows={num_rows}: {results[-1]['throughput_per_s']:.0f} rows/s, peak {peak:.1f} MiB")
+    return results
+
+
+def bench_local_insights(row_counts, repeat):
+    """End-to-end get_local_insights latency (featurize, fit, score, encrypt) by rows."""
+    results = []
+    for num_rows in row_counts:
+        text_df = _tiled_text_df(num_rows)
+        sensor_df = _tiled_sensor_df(num_rows)
+        image_labels_df = pd.DataFrame([
+            {"client_id": "bench_client", "image_id": i, "true_anomaly_status": label}
+            for i, (_, label) in enumerate(generate_synthetic_image_data(10, "bench_client"))
+        ])
+
+        def fn():
+            with contextlib.redirect_stdout(io.StringIO()):
+                get_local_insights("bench_client", text_df, image_labels_df, sensor_df)
+
+        samples = _time_calls(fn, repeat)
+        peak = _peak_memory_mb(fn)
+        results.append(_summarize("get_local_insights", {"rows": num_rows}, samples, peak_mb=peak))
+        print(f"  get_local_insights rows={num_rows}: {results[-1]['median_s'] * 1000:.1f} ms, peak {peak:.1f} MiB")
+    return results
+
+
+def simulate_fl_round(client_datasets, parameters):
+    """
+    One in-process FedAvg round without Flower transport: every client sets the
+    global parameters, fits locally and returns its update, then the server
+    computes the example-weighted average (as FedAvg does).
+    """
+    updates, weights = [], []
+    for X, y in client_datasets:
+        model = TextComplianceModel()
+        num_features = X.shape[1]
+        model.set_parameters({'coef': parameters[:num_features], 'intercept': parameters[num_features:]})
+        model.fit(X, y)
+        params = model.get_parameters()
+        updates.append(np.array(params['coef'] + params['intercept']))
+        weights.append(len(y))
+    return np.average(np.vstack(updates), axis=0, weights=weights)
+
+
+def bench_fl_round(client_counts, rows_per_client, repeat):
+    """Latency of one in-process FL round as the number of clients grows."""
+    results = []
+    for num_clients in client_counts:
+        client_datasets = []
+        for i in range(num_clients):
+            X, y = preprocess_text_data(_tiled_text_df(rows_per_client, client_id=f"bench_client_{i}"))
+            client_datasets.append((X, np.asarray(y)))
+        num_features = client_datasets[0][0].shape[1]
+        parameters = np.zeros(num_features + 1)
+
+        fn = lambda: simulate_fl_round(client_datasets, parameters)
+        samples = _time_calls(fn, repeat)
+        peak = _peak_memory_mb(fn)
+        params = {"clients": num_clients, "rows_per_client": rows_per_client}
+        results.append(_summarize("fl_round", params, samples, items_per_call=num_clients, peak_mb=peak))
+        print(f"  fl_round clients={num_clients}: {results[-1]['median_s'] * 1000:.1f} ms, peak {peak:.1f} MiB")
+    return results
+
+
+def run_suite(key_sizes, row_counts, client_counts, paillier_ops, rows_per_client, repeat):
+    """Runs every benchmark group and returns the JSON-serializable report."""
+    np.random.seed(42)
+    suite_start = time.perf_counter()
+    results = []
+    print("--- Paillier HE ---")
+    results += bench_paillier(key_sizes, paillier_ops, repeat)
+    print("--- Preprocessing ---")
+    results += bench_preprocessing(row_counts, repeat)
+    print("--- Local insights ---")
+    results += bench_local_insights(row_counts, repeat)
+    print("--- FL round (in-process) ---")
+    results += bench_fl_round(client_counts, rows_per_client, repeat)
+
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+    except ImportError:
+        peak_rss_mb = None
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "total_seconds": time.perf_counter() - suite_start,
+        "peak_rss_mb": peak_rss_mb,
+        "results": results,
+    }
+
+
+def compare_reports(current, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    Compares median latency and peak memory of every case present in both reports.
+    A case regresses when it is more than `threshold` (relative) slower or larger.
+    """
+    baseline_by_key = {_case_key(r): r for r in baseline.get("results", [])}
+    rows = []
+    for record in current["results"]:
+        key = _case_key(record)
+        base = baseline_by_key.get(key)
+        if base is None:
+            continue
+        for metric in ("median_s", "peak_mem_mb"):
+            if metric not in record or metric not in base or not base[metric]:
+                continue
+            ratio = record[metric] / base[metric]
+            rows.append({
+                "case": key,
+                "metric": metric,
+                "baseline": base[metric],
+                "current": record[metric],
+                "ratio": ratio,
+                "regression": ratio > 1 + threshold,
+            })
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"\n--- Comparison against baseline (threshold +{threshold:.0%}) ---")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ("improved" if row["ratio"] < 1 - threshold else "ok")
+        print(f"{row['case']:<60} {row['metric']:<12} {row['baseline']:>12.6g} -> {row['current']:>12.6g} ({row['ratio']:.2f}x) {flag}")
+    regressions = [r for r in rows if r["regression"]]
+    print(f"{len(regressions)} regression(s) out of {len(rows)} compared metric(s).")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Guardian AI offline benchmark suite.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="Where to write the JSON report.")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="Flag regressions against a stored baseline report.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD, help="Relative slowdown that counts as a regression.")
+    parser.add_argument("--key-sizes", type=int, nargs="+", default=DEFAULT_KEY_SIZES)
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROW_COUNTS)
+    parser.add_argument("--clients", type=int, nargs="+", default=DEFAULT_CLIENT_COUNTS)
+    parser.add_argument("--paillier-ops", type=int, default=50, help="HE operations per timed sample.")
+    parser.add_argument("--rows-per-client", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Small sizes for a smoke run.")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.key_sizes, args.rows, args.clients = [1024], [1_000], [3]
+        args.paillier_ops, args.rows_per_client, args.repeat = 10, 100, 2
+
+    report = run_suite(args.key_sizes, args.rows, args.clients, args.paillier_ops, args.rows_per_client, args.repeat)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_reports(report, baseline, args.threshold)
+        report["comparison"] = rows
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        if print_comparison(rows, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
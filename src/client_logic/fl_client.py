@@ -4,12 +4,15 @@ import pandas as pd
 from sklearn.metrics import accuracy_score
 import sys
 import os
+import time
 import wandb
 
 # Add parent directory to path to import common and client_logic modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from common.model_definition import TextComplianceModel
+from common import tracing
+from common.tracing import span
 from client_logic.local_model import get_model_and_data_for_fl, generate_global_paillier_keys
 from client_logic.data_generator import generate_synthetic_text_data, generate_synthetic_image_data, generate_synthetic_sensor_data, save_client_data_locally
 
@@ -22,25 +25,66 @@ public_key_global, private_key_global = generate_global_paillier_keys()
 class GuardianAIClient(fl.client.NumPyClient):
     def __init__(self, client_id):
         self.client_id = client_id
-        self.model, self.X_text, self.y_text = get_model_and_data_for_fl(client_id)
+        tracing.set_context(client_id=client_id, round=0)
+        with span("client.load_data"):
+            self.model, self.X_text, self.y_text = get_model_and_data_for_fl(client_id)
+        self._last_reply_at = None
         wandb.init(project="guardian-ai-fl", group="clients", name=f"client-{client_id}", reinit=True)
         print(f"Client {self.client_id} W&B initialized.")
 
+    def is_trainable(self):
+        return self.X_text.size > 0 and len(np.unique(self.y_text)) > 1
+
+    def get_properties(self, config):
+        """Capacity info the server's client manager uses to decide who trains each round."""
+        return {
+            "client_id": self.client_id,
+            "num_examples": len(self.X_text),
+            "trainable": int(self.is_trainable()),
+        }
+
     def get_parameters(self, config):
         if self.model.get_parameters()['coef'] and self.model.get_parameters()['intercept']:
             return self.model.get_parameters()['coef'] + self.model.get_parameters()['intercept']
         return []
 
+    def _begin_round(self, config):
+        """Tags subsequent spans with the round and records time spent waiting on the server."""
+        tracing.set_context(client_id=self.client_id, round=config.get("round", 0))
+        if self._last_reply_at is not None:
+            tracing.record_span("client.network_wait", self._last_reply_at, time.perf_counter())
+
+    def _end_round(self):
+        self._last_reply_at = time.perf_counter()
+
     def fit(self, parameters, config):
-        if self.X_text.size > 0 and len(np.unique(self.y_text)) > 1:
+        self._begin_round(config)
+        started = time.perf_counter()
+        try:
+            with span("client.fit"):
+                updated_parameters, num_examples, metrics = self._fit(parameters, config)
+        finally:
+            self._end_round()
+        metrics.update({
+            "client_id": self.client_id,
+            "trainable": int(self.is_trainable()),
+            "fit_seconds": time.perf_counter() - started,
+        })
+        return updated_parameters, num_examples, metrics
+
+    def _fit(self, parameters, config):
+        if self.is_trainable():
             num_features = self.X_text.shape[1]
-            coef = np.array(parameters[:num_features]).reshape(1, -1)
-            intercept = np.array(parameters[num_features:])
-            self.model.set_parameters({'coef': coef, 'intercept': intercept})
+            with span("client.set_parameters"):
+                coef = np.array(parameters[:num_features]).reshape(1, -1)
+                intercept = np.array(parameters[num_features:])
+                self.model.set_parameters({'coef': coef, 'intercept': intercept})
 
-            self.model.fit(self.X_text, self.y_text)
-            local_preds = self.model.predict(self.X_text)
-            local_accuracy = accuracy_score(self.y_text, local_preds)
+            with span("client.local_fit", rows=len(self.X_text)):
+                self.model.fit(self.X_text, self.y_text)
+            with span("client.local_eval"):
+                local_preds = self.model.predict(self.X_text)
+                local_accuracy = accuracy_score(self.y_text, local_preds)
 
             wandb.log({
                 f"client_{self.client_id}/local_accuracy": local_accuracy,
@@ -48,17 +92,21 @@ class GuardianAIClient(fl.client.NumPyClient):
                 "round": config.get("round", 0)
             })
             print(f"Client {self.client_id}: Local accuracy = {local_accuracy:.4f}")
-            return self.get_parameters(config={}), len(self.X_text), {"local_accuracy": local_accuracy}
+            with span("client.serialize_parameters"):
+                updated_parameters = self.get_parameters(config={})
+            return updated_parameters, len(self.X_text), {"local_accuracy": local_accuracy}
         else:
             print(f"Client {self.client_id}: Skipping local fit due to insufficient data/classes.")
             return [], len(self.X_text), {"local_accuracy": 0.0}
 
     def evaluate(self, parameters, config):
+        self._begin_round(config)
         loss = 0.1
         accuracy = 0.9
+        self._end_round()
         return float(loss), len(self.X_text), {"accuracy": accuracy}
 
-def main(client_id):
+def main(client_id, server_address="127.0.0.1:8080"):
     from client_logic.data_generator import generate_synthetic_text_data, generate_synthetic_image_data, generate_synthetic_sensor_data, save_client_data_locally
     text_df = generate_synthetic_text_data(50, client_id)
     image_data = generate_synthetic_image_data(5, client_id)
@@ -66,13 +114,15 @@ def main(client_id):
     save_client_data_locally(client_id, text_df, image_data, sensor_df)
 
     fl.client.start_client(
-        server_address="127.0.0.1:8080",
+        server_address=server_address,
         client=GuardianAIClient(client_id),
     )
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python fl_client.py <client_id>")
+        print("Usage: python fl_client.py <client_id> [server_address]")
         sys.exit(1)
     client_id = sys.argv[1]
-    main(client_id)
\ No newline at end of file
+    # Point at an edge aggregator (e.g. 127.0.0.1:8081) for hierarchical federation
+    server_address = sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1:8080"
+    main(client_id, server_address)
\ No newline at end of file
@@ -1,18 +1,24 @@
 from phe import paillier
+from common.tracing import span
+from common.audit_log import audit_event
 
 public_key_global, private_key_global = None, None
 
 def generate_global_paillier_keys():
     global public_key_global, private_key_global
     if public_key_global is None or private_key_global is None:
-        public_key_global, private_key_global = paillier.generate_paillier_keypair()
+        with span("he.keygen"):
+            public_key_global, private_key_global = paillier.generate_paillier_keypair()
+        audit_event("he.keygen", key_bits=public_key_global.n.bit_length())
     return public_key_global, private_key_global
 
 def encrypt_value(value, public_key):
-    return public_key.encrypt(value)
+    with span("he.encrypt"):
+        return public_key.encrypt(value)
 
 def decrypt_value(encrypted_value, private_key):
-    return private_key.decrypt(encrypted_value)
+    with span("he.decrypt"):
+        return private_key.decrypt(encrypted_value)
 
 def homomorphic_add_values(encrypted_val1, encrypted_val2):
     return encrypted_val1 + encrypted_val2
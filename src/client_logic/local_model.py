@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import StandardScaler
-from common.model_definition import TextComplianceModel, SensorAnomalyModel
+from common.model_definition import TextComplianceModel, SensorAnomalyModel, GLOBAL_TEXT_VECTORIZER
 from client_logic.he_utils import generate_global_paillier_keys, encrypt_value
+from common.tracing import span
+from common.audit_log import audit_event
 import random
 import os
 
@@ -12,25 +13,10 @@ import os
 # In a real system, keys would be loaded securely per client.
 public_key, private_key = generate_global_paillier_keys()
 
-def get_text_vectorizer():
-    """Returns a pre-fitted TF-IDF vectorizer for consistent feature extraction."""
-    # In a real FL scenario, this vectorizer (vocabulary) would be agreed upon globally.
-    # Here, we'll create a simple one based on common terms.
-    # For simplicity of demo and to avoid complex model sharing, we'll fit a basic one.
-    common_phrases = [
-        "terms conditions explained", "privacy policy understood", "no personal details",
-        "bank account number requested", "shared customer data", "aggressive sales",
-        "security protocol bypassed", "unencrypted log", "opt out options"
-    ]
-    vectorizer = TfidfVectorizer(max_features=100)
-    vectorizer.fit(common_phrases)
-    return vectorizer
-
-GLOBAL_TEXT_VECTORIZER = get_text_vectorizer() # Initialize once
-
 def preprocess_text_data(df):
     """Applies TF-IDF vectorization to text data using a global vectorizer."""
-    X_text = GLOBAL_TEXT_VECTORIZER.transform(df['text']).toarray()
+    with span("featurize.text", rows=len(df)):
+        X_text = GLOBAL_TEXT_VECTORIZER.transform(df['text']).toarray()
     # Convert 'compliant'/'non_compliant' to 0/1 for classification
     y_text = (df['true_compliance_status'] == 'non_compliant').astype(int) # 1 for non-compliant
     return X_text, y_text
@@ -39,7 +25,8 @@ def preprocess_sensor_data(df):
     """Standard scaling for sensor data."""
     scaler = StandardScaler()
     # Ensure sensor_value is 2D for scaler
-    X_sensor = scaler.fit_transform(df[['sensor_value']])
+    with span("featurize.sensor", rows=len(df)):
+        X_sensor = scaler.fit_transform(df[['sensor_value']])
     y_sensor = (df['true_anomaly_status'] == 'anomaly').astype(int) # 1 for anomaly
     return X_sensor, y_sensor
 
@@ -54,9 +41,10 @@ def get_local_insights(client_id, text_df, image_labels_df, sensor_df):
     X_text, y_text = preprocess_text_data(text_df)
     text_model = TextComplianceModel()
     if len(np.unique(y_text)) > 1: # Only fit if there are at least two classes
-        text_model.fit(X_text, y_text)
-        text_risk_score = text_model.predict_proba(X_text)[:, 1].mean() # Avg prob of non-compliant
-        local_text_accuracy = text_model.model.score(X_text, y_text)
+        with span("insights.text_model"):
+            text_model.fit(X_text, y_text)
+            text_risk_score = text_model.predict_proba(X_text)[:, 1].mean() # Avg prob of non-compliant
+            local_text_accuracy = text_model.model.score(X_text, y_text)
     else:
         text_risk_score = 0.0 # No non-compliant examples
         local_text_accuracy = 1.0 # If all are same class, perfect prediction
@@ -78,8 +66,9 @@ def get_local_insights(client_id, text_df, image_labels_df, sensor_df):
     # --- Sensor Modality ---
     X_sensor, y_sensor = preprocess_sensor_data(sensor_df)
     sensor_model = SensorAnomalyModel()
-    sensor_model.fit(X_sensor)
-    sensor_predictions = sensor_model.predict(X_sensor)
+    with span("insights.sensor_model"):
+        sensor_model.fit(X_sensor)
+        sensor_predictions = sensor_model.predict(X_sensor)
     sensor_anomaly_rate = np.mean(sensor_predictions == -1) # -1 is anomaly for IsolationForest
     # We can't calculate a direct 'accuracy' for unsupervised anomaly detection easily
     # but we can compare to true labels if available for internal validation.
@@ -91,9 +80,11 @@ def get_local_insights(client_id, text_df, image_labels_df, sensor_df):
     # For demo, we'll only federate text model parameters for FL.
     # Other insights (risk scores) can be aggregated via conceptual HE sums.
 
-    encrypted_text_risk = encrypt_value(float(text_risk_score), public_key)
-    encrypted_image_risk = encrypt_value(float(image_risk_score), public_key)
-    encrypted_sensor_risk = encrypt_value(float(sensor_anomaly_rate), public_key)
+    with span("insights.encrypt"):
+        encrypted_text_risk = encrypt_value(float(text_risk_score), public_key)
+        encrypted_image_risk = encrypt_value(float(image_risk_score), public_key)
+        encrypted_sensor_risk = encrypt_value(float(sensor_anomaly_rate), public_key)
+    audit_event("insights.encrypted", client_id=client_id, values=["text_risk", "image_risk", "sensor_risk"])
 
     return {
         "text_model_params": text_model.get_parameters(), # Parameters to be federated
@@ -114,9 +105,10 @@ def get_local_insights(client_id, text_df, image_labels_df, sensor_df):
 def load_client_raw_data(client_id):
     """Loads raw synthetic data for a given client from local files."""
     base_path = os.path.join("data", "synthetic")
-    text_df = pd.read_csv(os.path.join(base_path, f"{client_id}_text.csv"))
-    image_labels_df = pd.read_csv(os.path.join(base_path, f"{client_id}_image_labels.csv"))
-    sensor_df = pd.read_csv(os.path.join(base_path, f"{client_id}_sensor.csv"))
+    with span("data.load"):
+        text_df = pd.read_csv(os.path.join(base_path, f"{client_id}_text.csv"))
+        image_labels_df = pd.read_csv(os.path.join(base_path, f"{client_id}_image_labels.csv"))
+        sensor_df = pd.read_csv(os.path.join(base_path, f"{client_id}_sensor.csv"))
     return text_df, image_labels_df, sensor_df
 
 def get_model_and_data_for_fl(client_id):
@@ -137,7 +129,8 @@ def get_model_and_data_for_fl(client_id):
     # Initial fit to ensure model has parameters set before FL round 1
     # This won't be saved, just initializes model weights
     try:
-        model.fit(X_text, y_text)
+        with span("model.initial_fit"):
+            model.fit(X_text, y_text)
     except ValueError as e:
         print(f"Client {client_id} initial fit failed: {e}. Returning empty model.")
         return TextComplianceModel(), np.array([]), np.array([])
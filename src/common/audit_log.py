@@ -0,0 +1,286 @@
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Append-only, hash-chained audit trail of sensitive operations (key generation,
+# encryption, aggregation, decryption). Callers only enqueue events; a background
+# writer group-commits them in batches, so the HE and FL hot paths never touch disk.
+# Setting GUARDIAN_AUDIT_DB to an empty string disables the process-wide log.
+AUDIT_DB_ENV = "GUARDIAN_AUDIT_DB"
+# Anchored to the repository root so importing a module that audits never drops a database into the caller's cwd
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_AUDIT_DB = os.path.join(_REPO_ROOT, "data", "audit", "audit_log.db")
+GENESIS_HASH = "0" * 64
+RETRY_INITIAL_DELAY = 0.1
+RETRY_MAX_DELAY = 5.0
+CLOSE_RETRIES = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_events (
+    seq INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    event_type TEXT NOT NULL,
+    client_id TEXT,
+    actor TEXT,
+    details TEXT NOT NULL,
+    prev_hash TEXT NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_audit_client_seq ON audit_events (client_id, seq);
+CREATE INDEX IF NOT EXISTS idx_audit_type_seq ON audit_events (event_type, seq);
+CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_events (ts);
+CREATE TRIGGER IF NOT EXISTS audit_no_update BEFORE UPDATE ON audit_events
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS audit_no_delete BEFORE DELETE ON audit_events
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+"""
+
+
+def default_audit_path():
+    return os.environ.get(AUDIT_DB_ENV, DEFAULT_AUDIT_DB)
+
+
+def _event_hash(prev_hash, seq, ts, event_type, client_id, actor, details):
+    payload = json.dumps([seq, ts, event_type, client_id, actor, details], separators=(",", ":"))
+    return hashlib.sha256((prev_hash + payload).encode("utf-8")).hexdigest()
+
+
+_RETRY = object()
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+        self.committed = False
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class AuditLog:
+    """
+    SQLite-backed audit log. record() is a non-blocking queue put; the writer
+    thread drains up to batch_size events (or whatever arrived within
+    flush_interval) and appends them in one transaction, chaining each event's
+    hash to the previous one. Events are indexed by client, type and time.
+    If a commit fails, the batch stays queued and is retried with exponential
+    backoff; flush() reports the failure and last_error holds the cause.
+    """
+
+    def __init__(self, path=DEFAULT_AUDIT_DB, batch_size=1000, flush_interval=0.1):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with contextlib.closing(_connect(path)) as connection:
+            connection.executescript(_SCHEMA)
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self.last_error = None
+        self._writer = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, event_type, client_id=None, actor=None, **details):
+        """Enqueues one event. Returns immediately; the write happens on the writer thread."""
+        if self._closed:
+            raise RuntimeError("Audit log is closed.")
+        self._queue.put((time.time(), event_type, client_id, actor, details))
+
+    def flush(self, timeout=None):
+        """
+        Blocks until every event recorded so far has been committed. Returns
+        False on timeout or if the commit failed (the events stay queued for retry).
+        """
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout) and request.committed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join()
+
+    def _run(self):
+        connection = _connect(self.path)
+        stop = False
+        batch, retry_delay = [], 0.0
+        while not stop:
+            waiters = []
+            try:
+                # After a failed commit, wait at most the backoff delay before retrying
+                item = self._queue.get(timeout=retry_delay) if batch else self._queue.get()
+            except queue.Empty:
+                item = _RETRY
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _RETRY:
+                    break  # nothing new arrived during the backoff; retry the carried batch
+                if item is None:
+                    stop = True
+                elif isinstance(item, _FlushRequest):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and not waiters:
+                    break
+                try:
+                    # Flush requests commit whatever is already queued without waiting out the interval
+                    item = self._queue.get(timeout=max(remaining, 0)) if not waiters else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                attempts = CLOSE_RETRIES if stop else 1
+                for attempt in range(attempts):
+                    try:
+                        self._append(connection, batch)
+                        batch, retry_delay, self.last_error = [], 0.0, None
+                        break
+                    except sqlite3.Error as e:
+                        self.last_error = e
+                        retry_delay = min(max(retry_delay * 2, RETRY_INITIAL_DELAY), RETRY_MAX_DELAY)
+                        print(f"Audit log write of {len(batch)} event(s) failed: {e}; retrying in {retry_delay:.1f}s.")
+                        if attempt + 1 < attempts:
+                            time.sleep(retry_delay)
+                if batch and stop:
+                    print(f"Audit log closed with {len(batch)} uncommitted event(s): {self.last_error}")
+            for waiter in waiters:
+                waiter.committed = not batch
+                waiter.done.set()
+        connection.close()
+
+    def _append(self, connection, batch):
+        # BEGIN IMMEDIATE takes the write lock before reading the chain head, so
+        # several processes sharing one database still produce a single chain.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            head = connection.execute("SELECT seq, hash FROM audit_events ORDER BY seq DESC LIMIT 1").fetchone()
+            seq, prev_hash = head if head else (0, GENESIS_HASH)
+            rows = []
+            for ts, event_type, client_id, actor, details in batch:
+                seq += 1
+                details_json = json.dumps(details, sort_keys=True, default=str)
+                event_hash = _event_hash(prev_hash, seq, ts, event_type, client_id, actor, details_json)
+                rows.append((seq, ts, event_type, client_id, actor, details_json, prev_hash, event_hash))
+                prev_hash = event_hash
+            connection.executemany("INSERT INTO audit_events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+
+def _where(client_id=None, event_type=None, since=None, until=None, before_seq=None):
+    clauses, params = [], []
+    for column, op, value in (("client_id", "=", client_id), ("event_type", "=", event_type),
+                              ("ts", ">=", since), ("ts", "<", until), ("seq", "<", before_seq)):
+        if value is not None:
+            clauses.append(f"{column} {op} ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_events(path=None, client_id=None, event_type=None, since=None, until=None, before_seq=None, limit=50):
+    """
+    Returns one page of events, newest first. Pass the smallest "seq" of the
+    previous page as before_seq to get the next (older) page; keyset paging
+    stays fast no matter how deep into millions of events the reader goes.
+    """
+    path = path or default_audit_path()
+    if not os.path.exists(path):
+        return []
+    where, params = _where(client_id, event_type, since, until, before_seq)
+    sql = f"SELECT seq, ts, event_type, client_id, actor, details, hash FROM audit_events{where} ORDER BY seq DESC LIMIT ?"
+    with contextlib.closing(_connect(path)) as connection:
+        rows = connection.execute(sql, params + [limit]).fetchall()
+    return [
+        {"seq": seq, "ts": ts, "event_type": event_type, "client_id": client_id, "actor": actor,
+         "details": json.loads(details), "hash": event_hash}
+        for seq, ts, event_type, client_id, actor, details, event_hash in rows
+    ]
+
+
+def count_events(path=None, client_id=None, event_type=None, since=None, until=None):
+    path = path or default_audit_path()
+    if not os.path.exists(path):
+        return 0
+    where, params = _where(client_id, event_type, since, until)
+    with contextlib.closing(_connect(path)) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM audit_events{where}", params).fetchone()[0]
+
+
+def distinct_values(column, path=None):
+    """Distinct client ids or event types, for dashboard filters."""
+    path = path or default_audit_path()
+    if column not in ("client_id", "event_type") or not os.path.exists(path):
+        return []
+    with contextlib.closing(_connect(path)) as connection:
+        rows = connection.execute(f"SELECT DISTINCT {column} FROM audit_events WHERE {column} IS NOT NULL ORDER BY {column}").fetchall()
+    return [row[0] for row in rows]
+
+
+def verify_chain(path=None, chunk_size=10_000):
+    """
+    Recomputes the hash chain. Returns (True, None) if intact, otherwise
+    (False, seq) for the first event that was altered, removed or reordered.
+    """
+    path = path or default_audit_path()
+    if not os.path.exists(path):
+        return True, None
+    prev_hash, expected_seq, last_seq = GENESIS_HASH, 1, 0
+    with contextlib.closing(_connect(path)) as connection:
+        while True:
+            rows = connection.execute(
+                "SELECT seq, ts, event_type, client_id, actor, details, prev_hash, hash FROM audit_events WHERE seq > ? ORDER BY seq LIMIT ?",
+                (last_seq, chunk_size),
+            ).fetchall()
+            if not rows:
+                return True, None
+            for seq, ts, event_type, client_id, actor, details, stored_prev, stored_hash in rows:
+                if seq != expected_seq or stored_prev != prev_hash:
+                    return False, seq
+                if _event_hash(prev_hash, seq, ts, event_type, client_id, actor, details) != stored_hash:
+                    return False, seq
+                prev_hash, expected_seq, last_seq = stored_hash, seq + 1, seq
+
+
+_default_log = None
+_default_lock = threading.Lock()
+
+
+def get_audit_log():
+    """
+    Process-wide audit log at $GUARDIAN_AUDIT_DB (default <repo root>/data/audit/audit_log.db),
+    or None if auditing is disabled with GUARDIAN_AUDIT_DB="".
+    """
+    global _default_log
+    if not default_audit_path():
+        return None
+    if _default_log is None:
+        with _default_lock:
+            if _default_log is None:
+                _default_log = AuditLog(default_audit_path())
+                atexit.register(_default_log.close)
+    return _default_log
+
+
+def audit_event(event_type, client_id=None, actor=None, **details):
+    """Records an event in the process-wide audit log (no-op if auditing is disabled)."""
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        audit_log.record(event_type, client_id=client_id, actor=actor, **details)
@@ -1,7 +1,40 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import IsolationForest
 import numpy as np
 
+def get_text_vectorizer():
+    """Returns a pre-fitted TF-IDF vectorizer for consistent feature extraction."""
+    # In a real FL scenario, this vectorizer (vocabulary) would be agreed upon globally.
+    # Clients, the server-side evaluator and the scoring service all share it.
+    # Here, we'll create a simple one based on common terms.
+    # For simplicity of demo and to avoid complex model sharing, we'll fit a basic one.
+    common_phrases = [
+        "terms conditions explained", "privacy policy understood", "no personal details",
+        "bank account number requested", "shared customer data", "aggressive sales",
+        "security protocol bypassed", "unencrypted log", "opt out options"
+    ]
+    vectorizer = TfidfVectorizer(max_features=100)
+    vectorizer.fit(common_phrases)
+    return vectorizer
+
+GLOBAL_TEXT_VECTORIZER = get_text_vectorizer() # Initialize once
+
+def score_linear(X, coef, intercept):
+    """
+    Positive-class (non-compliant) probability of a logistic model as one sparse
+    matrix-vector product. Works on scipy sparse or dense X without sklearn's
+    per-call validation overhead.
+    """
+    coef = np.asarray(coef, dtype=np.float64).ravel()
+    z = np.asarray(X @ coef).ravel() + float(np.asarray(intercept).ravel()[0])
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -500, 500)))
+
+def split_flat_parameters(parameters, num_features):
+    """Splits the flat FL parameter list (coef + intercept) into (coef, intercept)."""
+    flat = np.asarray([float(p) for p in parameters], dtype=np.float64)
+    return flat[:num_features], flat[num_features:]
+
 class TextComplianceModel:
     def __init__(self):
         """A simple Logistic Regression model for text compliance classification."""
@@ -0,0 +1,229 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Tracing is off unless GUARDIAN_TRACE_DIR is set (or enable() is called).
+# When disabled, span() returns a shared no-op context manager, so the
+# instrumented hot paths only pay for one global lookup and a function call.
+TRACE_DIR_ENV = "GUARDIAN_TRACE_DIR"
+
+_enabled = False
+_trace_dir = None
+_process_name = None
+_events = []
+_events_lock = threading.Lock()
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+
+    def __enter__(self):
+        _stack().append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        stack = _stack()
+        path = ";".join(stack)
+        stack.pop()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _record(self.name, self.start, end, self.attrs, path)
+        return False
+
+    def set(self, **attrs):
+        """Attaches extra attributes (e.g. payload sizes) to the open span."""
+        self.attrs.update(attrs)
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _record(name, start, end, attrs, path):
+    args = {"client_id": getattr(_local, "client_id", None), "round": getattr(_local, "round", None)}
+    args.update(attrs)
+    event = {
+        "name": name,
+        "ts": (start - _origin) * 1e6,
+        "dur": (end - start) * 1e6,
+        "tid": threading.get_ident(),
+        "stack": path,
+        "args": args,
+    }
+    with _events_lock:
+        _events.append(event)
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(trace_dir=None):
+    """Turns tracing on. If trace_dir is given, traces are exported there at process exit."""
+    global _enabled, _trace_dir
+    _enabled = True
+    if trace_dir and _trace_dir is None:
+        _trace_dir = trace_dir
+        atexit.register(_export_at_exit)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Drops all recorded spans."""
+    with _events_lock:
+        _events.clear()
+
+
+def set_process_name(name):
+    """Labels this process in exported traces (e.g. "fl_server")."""
+    global _process_name
+    _process_name = name
+
+
+def set_context(client_id=None, round=None):
+    """Sets the client id / round number attached to spans opened on this thread."""
+    if client_id is not None:
+        _local.client_id = client_id
+    if round is not None:
+        _local.round = round
+
+
+def span(name, **attrs):
+    """Context manager timing a block of work. No-op while tracing is disabled."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+
+def record_span(name, start, end, **attrs):
+    """Records an already-measured interval (perf_counter timestamps), e.g. network wait."""
+    if not _enabled:
+        return
+    stack = _stack()
+    path = ";".join(stack + [name])
+    _record(name, start, end, attrs, path)
+
+
+def get_events():
+    with _events_lock:
+        return list(_events)
+
+
+def to_chrome_trace(process_name=None):
+    """Returns the recorded spans as a Chrome trace-event document (chrome://tracing, Perfetto)."""
+    pid = os.getpid()
+    trace_events = []
+    if process_name:
+        trace_events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": process_name}})
+    for event in get_events():
+        trace_events.append({
+            "name": event["name"],
+            "cat": event["name"].split(".", 1)[0],
+            "ph": "X",
+            "ts": event["ts"],
+            "dur": event["dur"],
+            "pid": pid,
+            "tid": event["tid"],
+            "args": event["args"],
+        })
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path, process_name=None):
+    with open(path, "w") as f:
+        json.dump(to_chrome_trace(process_name), f, default=str)
+    return path
+
+
+def export_folded_stacks(path):
+    """Writes self-time per stack in the folded format used by flamegraph.pl / speedscope."""
+    totals = defaultdict(float)
+    child_time = defaultdict(float)
+    for event in get_events():
+        totals[event["stack"]] += event["dur"]
+        parent = event["stack"].rsplit(";", 1)[0] if ";" in event["stack"] else None
+        if parent is not None:
+            child_time[parent] += event["dur"]
+    with open(path, "w") as f:
+        for stack, total in sorted(totals.items()):
+            self_us = max(total - child_time.get(stack, 0.0), 0.0)
+            f.write(f"{stack} {int(self_us)}\n")
+    return path
+
+
+def round_summary():
+    """Aggregates spans per (round, span name): count, total and mean milliseconds."""
+    buckets = defaultdict(list)
+    for event in get_events():
+        buckets[(event["args"].get("round"), event["name"])].append(event["dur"] / 1000.0)
+    rows = []
+    for (round_number, name), durations in buckets.items():
+        rows.append({
+            "round": round_number,
+            "span": name,
+            "count": len(durations),
+            "total_ms": sum(durations),
+            "mean_ms": sum(durations) / len(durations),
+            "max_ms": max(durations),
+        })
+    rows.sort(key=lambda r: (r["round"] is None, r["round"] if r["round"] is not None else 0, -r["total_ms"]))
+    return rows
+
+
+def format_round_summary(rows=None):
+    rows = round_summary() if rows is None else rows
+    lines = [f"{'round':>5}  {'span':<32} {'count':>6} {'total_ms':>10} {'mean_ms':>9} {'max_ms':>9}"]
+    for row in rows:
+        round_label = "-" if row["round"] is None else str(row["round"])
+        lines.append(f"{round_label:>5}  {row['span']:<32} {row['count']:>6} {row['total_ms']:>10.2f} {row['mean_ms']:>9.2f} {row['max_ms']:>9.2f}")
+    return "\n".join(lines)
+
+
+def _export_at_exit():
+    if not _trace_dir or not get_events():
+        return
+    os.makedirs(_trace_dir, exist_ok=True)
+    label = _process_name or getattr(_local, "client_id", None) or "process"
+    base = os.path.join(_trace_dir, f"trace_{label}_{os.getpid()}")
+    export_chrome_trace(base + ".json", process_name=str(label))
+    export_folded_stacks(base + ".folded")
+    with open(base + "_summary.txt", "w") as f:
+        f.write(format_round_summary() + "\n")
+    print(f"Trace written to {base}.json (summary: {base}_summary.txt)")
+
+
+if os.environ.get(TRACE_DIR_ENV):
+    enable(os.environ[TRACE_DIR_ENV])
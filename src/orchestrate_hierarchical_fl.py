@@ -0,0 +1,76 @@
+import subprocess
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT_PORT = 8080
+FIRST_EDGE_PORT = 8081
+
+def run_hierarchical_fl_simulation(num_rounds=3, num_regions=2, clients_per_region=2):
+    """
+    Runs a two-level federation on one machine: one root server, one edge
+    aggregator per region and clients_per_region clients behind each edge.
+    """
+    print("--- Starting Hierarchical Federated Learning Simulation ---")
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    # Child processes import common/, client_logic/ and server_logic/ from src
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (src_dir, os.environ.get("PYTHONPATH")) if p))
+    processes = []
+
+    # 1. Root server only waits for one connection per region
+    server_process = subprocess.Popen(
+        [sys.executable, os.path.join(src_dir, 'server_logic', 'fl_server.py'),
+         '--rounds', str(num_rounds), '--clients', str(num_regions)],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env
+    )
+    print("Root FL Server started in background. Waiting for 20 seconds for it to become ready...")
+    time.sleep(20)
+
+    # 2. One edge aggregator per region; each joins the root once its clients are connected
+    for region in range(num_regions):
+        region_id = f"region_{region}"
+        edge_address = f"127.0.0.1:{FIRST_EDGE_PORT + region}"
+        edge_process = subprocess.Popen(
+            [sys.executable, os.path.join(src_dir, 'server_logic', 'edge_aggregator.py'), region_id,
+             '--listen', edge_address, '--root', f"127.0.0.1:{ROOT_PORT}", '--clients', str(clients_per_region)],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env
+        )
+        processes.append(edge_process)
+        print(f"Edge aggregator {region_id} started on {edge_address}.")
+    time.sleep(5)
+
+    # 3. Clients connect to their regional edge instead of the root
+    for region in range(num_regions):
+        edge_address = f"127.0.0.1:{FIRST_EDGE_PORT + region}"
+        for i in range(clients_per_region):
+            client_id = f"client_{region}_{chr(65 + i)}"
+            client_process = subprocess.Popen(
+                [sys.executable, os.path.join(src_dir, 'client_logic', 'fl_client.py'), client_id, edge_address],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env
+            )
+            processes.append(client_process)
+            print(f"Client {client_id} started in background (edge {edge_address}).")
+            time.sleep(2)
+
+    # 4. Wait for edges and clients, then the root
+    print("\nWaiting for edge aggregators and clients to complete their rounds...")
+    for p in processes:
+        try:
+            p.wait(timeout=300)
+        except subprocess.TimeoutExpired:
+            print(f"Process timed out: {p.args}")
+            p.kill()
+
+    print("\nWaiting for root FL Server to complete...")
+    try:
+        server_process.wait(timeout=300)
+    except subprocess.TimeoutExpired:
+        print("Server process timed out.")
+        server_process.kill()
+
+    print("\n--- Hierarchical Federated Learning Simulation Complete ---")
+
+if __name__ == "__main__":
+    run_hierarchical_fl_simulation(num_rounds=3, num_regions=2, clients_per_region=2)
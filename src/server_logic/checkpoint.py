@@ -0,0 +1,250 @@
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import flwr as fl
+import numpy as np
+from flwr.common import ndarrays_to_parameters, parameters_to_ndarrays
+
+# Add parent directory to path to import common modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common import tracing
+from common.tracing import span
+from common.audit_log import audit_event
+
+DEFAULT_CHECKPOINT_DIR = os.path.join("data", "checkpoints")
+_CHECKPOINT_PATTERN = re.compile(r"round_(\d+)\.npz$")
+_RUN_DIR_PREFIX = "run_"
+
+
+def checkpoint_path(checkpoint_dir, server_round):
+    return os.path.join(checkpoint_dir, f"round_{server_round:06d}.npz")
+
+
+def list_checkpoints(checkpoint_dir):
+    """Returns [(round, path)] for all complete checkpoints, oldest first."""
+    found = []
+    for path in glob.glob(os.path.join(checkpoint_dir, "round_*.npz")):
+        match = _CHECKPOINT_PATTERN.search(path)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def new_run_dir(checkpoint_dir):
+    """
+    Creates the directory for a fresh run's checkpoints, <checkpoint_dir>/run_<timestamp>.
+    Every run gets its own directory, so starting without --resume never touches older runs.
+    """
+    base = os.path.join(checkpoint_dir, _RUN_DIR_PREFIX + time.strftime("%Y%m%d-%H%M%S"))
+    run_dir, suffix = base, 1
+    while os.path.exists(run_dir):
+        run_dir, suffix = f"{base}_{suffix}", suffix + 1
+    os.makedirs(run_dir)
+    return run_dir
+
+
+def latest_run_dir(checkpoint_dir):
+    """
+    Returns the newest run directory under checkpoint_dir that holds a checkpoint,
+    checkpoint_dir itself if the checkpoints sit directly in it, or None.
+    """
+    if list_checkpoints(checkpoint_dir):
+        return checkpoint_dir
+    runs = sorted(glob.glob(os.path.join(checkpoint_dir, _RUN_DIR_PREFIX + "*")), reverse=True)
+    for run_dir in runs:
+        if os.path.isdir(run_dir) and list_checkpoints(run_dir):
+            return run_dir
+    return None
+
+
+def load_checkpoint(path):
+    """
+    Loads one checkpoint file. Returns a dict with "round", "parameters"
+    (list of ndarrays, in Flower order), "strategy_state" and "metrics_history".
+    """
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        parameters = [data[f"param_{i}"] for i in range(meta["num_parameters"])]
+    return {
+        "round": meta["round"],
+        "parameters": parameters,
+        "strategy_state": meta.get("strategy_state", {}),
+        "metrics_history": meta.get("metrics_history", []),
+        "saved_at": meta.get("saved_at"),
+    }
+
+
+def load_latest_checkpoint(checkpoint_dir):
+    """Loads the newest checkpoint of the latest run in checkpoint_dir, or returns None if there is none."""
+    run_dir = latest_run_dir(checkpoint_dir)
+    if run_dir is None:
+        return None
+    return load_checkpoint(list_checkpoints(run_dir)[-1][1])
+
+
+class CheckpointWriter:
+    """
+    Writes round checkpoints on a single background thread so the FL round loop
+    never waits on disk. Each file is written to a temp name, fsynced and then
+    atomically renamed, so a crash mid-write never leaves a corrupt "latest".
+    """
+
+    def __init__(self, checkpoint_dir=DEFAULT_CHECKPOINT_DIR, keep_last=3):
+        self.checkpoint_dir = checkpoint_dir
+        self.keep_last = keep_last
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+        self._pending = []
+
+    def save_async(self, server_round, parameters, strategy_state=None, metrics_history=None):
+        """Snapshots the round state now and queues the write. Returns a Future."""
+        arrays = {f"param_{i}": np.array(p, copy=True) for i, p in enumerate(parameters)}
+        meta = json.dumps({
+            "round": server_round,
+            "num_parameters": len(arrays),
+            "strategy_state": strategy_state or {},
+            "metrics_history": metrics_history or [],
+            "saved_at": time.time(),
+        }, default=float)
+        future = self._executor.submit(self._write, server_round, arrays, meta)
+        future.add_done_callback(self._report_failure)
+        self._pending = [f for f in self._pending if not f.done()] + [future]
+        return future
+
+    def _write(self, server_round, arrays, meta):
+        with span("server.checkpoint_write", client_id="server", round=server_round):
+            path = checkpoint_path(self.checkpoint_dir, server_round)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, meta=np.array(meta), **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self._fsync_dir()
+            self._prune()
+        return path
+
+    def _fsync_dir(self):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.checkpoint_dir, os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _prune(self):
+        if self.keep_last is None:
+            return
+        for _, path in list_checkpoints(self.checkpoint_dir)[:-self.keep_last]:
+            os.remove(path)
+
+    @staticmethod
+    def _report_failure(future):
+        error = future.exception()
+        if error is not None:
+            print(f"Checkpoint write failed: {error}")
+
+    def flush(self):
+        """Blocks until every queued checkpoint is on disk."""
+        for future in self._pending:
+            future.exception()
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+
+class CheckpointingFedAvg(fl.server.strategy.FedAvg):
+    """
+    FedAvg that checkpoints the aggregated global parameters, its own state and
+    the metrics history after every round. The write is queued right after
+    Flower's server-side evaluation of the round, so its metrics are included.
+    When resuming, round_offset is the last completed round, so config,
+    evaluation and checkpoints keep counting from there even though Flower
+    restarts its loop at round 1.
+    """
+
+    def __init__(self, checkpoint_writer, round_offset=0, metrics_history=None, **kwargs):
+        super().__init__(**kwargs)
+        self.checkpoint_writer = checkpoint_writer
+        self.round_offset = round_offset
+        self.metrics_history = list(metrics_history or [])
+        self._unsaved_round = None
+
+    def global_round(self, server_round):
+        return server_round + self.round_offset
+
+    def strategy_state(self):
+        """State needed to resume this strategy; subclasses extend it."""
+        return {"round_offset": self.round_offset}
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        # Tag the round's server-side spans (sampling, aggregation) before any of them start
+        tracing.set_context(client_id="server", round=self.global_round(server_round))
+        return super().configure_fit(self.global_round(server_round), parameters, client_manager)
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        tracing.set_context(client_id="server", round=self.global_round(server_round))
+        return super().configure_evaluate(self.global_round(server_round), parameters, client_manager)
+
+    def aggregate_fit(self, server_round, results, failures):
+        global_round = self.global_round(server_round)
+        with span("server.aggregate_fit", clients=len(results)):
+            parameters, metrics = super().aggregate_fit(global_round, results, failures)
+        audit_event(
+            "fl.aggregate", actor="fl_server", round=global_round,
+            num_results=len(results), num_failures=len(failures), succeeded=parameters is not None,
+        )
+        if parameters is not None:
+            self.metrics_history.append({
+                "round": global_round,
+                "num_results": len(results),
+                "num_failures": len(failures),
+                "fit_metrics": dict(metrics),
+            })
+            self._unsaved_round = global_round
+        return parameters, metrics
+
+    def evaluate(self, server_round, parameters):
+        # Flower calls this after every aggregate_fit, with the new global parameters
+        global_round = self.global_round(server_round)
+        result = super().evaluate(global_round, parameters)
+        if self._unsaved_round == global_round:
+            if result is not None:
+                loss, metrics = result
+                self.metrics_history[-1]["server_loss"] = float(loss)
+                self.metrics_history[-1]["server_metrics"] = dict(metrics)
+            self.checkpoint_writer.save_async(
+                global_round, parameters_to_ndarrays(parameters), self.strategy_state(), self.metrics_history
+            )
+            self._unsaved_round = None
+        return result
+
+    def aggregate_evaluate(self, server_round, results, failures):
+        return super().aggregate_evaluate(self.global_round(server_round), results, failures)
+
+
+def resume_state(checkpoint_dir):
+    """
+    Returns (initial_parameters, round_offset, metrics_history, strategy_state)
+    for resuming from the latest checkpoint, or (None, 0, [], {}) if none exists.
+    """
+    checkpoint = load_latest_checkpoint(checkpoint_dir)
+    if checkpoint is None:
+        print(f"No checkpoint found in {checkpoint_dir}; starting from scratch.")
+        return None, 0, [], {}
+    print(f"Resuming from checkpoint of round {checkpoint['round']} in {checkpoint_dir}.")
+    return (
+        ndarrays_to_parameters(checkpoint["parameters"]),
+        checkpoint["round"],
+        checkpoint["metrics_history"],
+        checkpoint["strategy_state"],
+    )
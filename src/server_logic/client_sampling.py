@@ -0,0 +1,233 @@
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import flwr as fl
+import numpy as np
+from flwr.common import GetPropertiesIns
+
+# Add parent directory to path to import common modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.tracing import span
+from server_logic.checkpoint import CheckpointingFedAvg
+
+PROPERTIES_TIMEOUT_SECONDS = 10.0
+LATENCY_EMA_ALPHA = 0.3
+
+
+def _new_stats():
+    return {
+        "num_examples": None,
+        "fit_seconds": None,
+        "trainable": None,
+        "participations": 0,
+        "failures": 0,
+    }
+
+
+def drop_empty_updates(results):
+    """Filters out fit results from clients that skipped training (no examples or no parameters)."""
+    return [(client, fit_res) for client, fit_res in results if fit_res.num_examples > 0 and fit_res.parameters.tensors]
+
+
+class CapacityAwareClientManager(fl.server.SimpleClientManager):
+    """
+    Samples a fixed number of clients per round instead of the whole fleet.
+
+    Each connected client gets a selection weight from what it has reported:
+    data size (more examples, more weight), recent fit latency (slow clients
+    are picked less), reliability (recent failures) and fairness (clients
+    that have participated less are preferred). Clients that report they
+    cannot train (no data or a single class) are never sampled. Stats are
+    keyed by the client's own id, so they survive reconnects and resumes.
+    """
+
+    def __init__(self, probe_new_clients=True, seed=None, wait_timeout=86400):
+        super().__init__()
+        self.probe_new_clients = probe_new_clients
+        self.wait_timeout = wait_timeout
+        self.client_stats = {}
+        self._cid_to_client_id = {}
+        self._known_client_ids = set()
+        self._stats_lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+
+    def _stats_for(self, cid):
+        key = self._cid_to_client_id.get(cid, cid)
+        if key not in self.client_stats:
+            self.client_stats[key] = _new_stats()
+        return self.client_stats[key]
+
+    def _update_from_report(self, cid, report):
+        """Applies client-reported properties or fit metrics to the client's stats."""
+        client_id = report.get("client_id")
+        with self._stats_lock:
+            if client_id and self._cid_to_client_id.get(cid) != str(client_id):
+                self._cid_to_client_id[cid] = str(client_id)
+                self._known_client_ids.add(str(client_id))
+                # Stats gathered before the client identified itself move to its id
+                provisional = self.client_stats.pop(cid, None)
+                if provisional is not None and str(client_id) not in self.client_stats:
+                    self.client_stats[str(client_id)] = provisional
+            stats = self._stats_for(cid)
+            if "num_examples" in report:
+                stats["num_examples"] = int(report["num_examples"])
+            if "trainable" in report:
+                stats["trainable"] = bool(report["trainable"])
+            if "fit_seconds" in report:
+                seconds = float(report["fit_seconds"])
+                previous = stats["fit_seconds"]
+                stats["fit_seconds"] = seconds if previous is None else (1 - LATENCY_EMA_ALPHA) * previous + LATENCY_EMA_ALPHA * seconds
+        return stats
+
+    def unregister(self, client):
+        super().unregister(client)
+        with self._stats_lock:
+            self._cid_to_client_id.pop(client.cid, None)
+            self.client_stats.pop(client.cid, None)
+
+    def record_fit_result(self, cid, num_examples, metrics):
+        stats = self._update_from_report(cid, dict(metrics, num_examples=num_examples))
+        with self._stats_lock:
+            stats["participations"] += 1
+            stats["failures"] = max(stats["failures"] - 1, 0)
+
+    def record_failure(self, cid, metrics=None):
+        if metrics:
+            self._update_from_report(cid, metrics)
+        with self._stats_lock:
+            self._stats_for(cid)["failures"] += 1
+
+    def _probe(self, cids):
+        """Asks clients we know nothing about for their properties, in parallel."""
+        def probe(cid):
+            client = self.clients.get(cid)
+            if client is None:
+                return
+            ins = GetPropertiesIns(config={})
+            try:
+                try:
+                    res = client.get_properties(ins, timeout=PROPERTIES_TIMEOUT_SECONDS, group_id=None)
+                except TypeError:
+                    # flwr < 1.6 has no group_id argument
+                    res = client.get_properties(ins, timeout=PROPERTIES_TIMEOUT_SECONDS)
+                stats = self._update_from_report(cid, res.properties)
+                with self._stats_lock:
+                    if stats["trainable"] is None:
+                        # Client does not report trainability; assume it can train
+                        stats["trainable"] = True
+            except Exception as e:
+                print(f"Client sampling: could not fetch properties of {cid}: {e}")
+
+        with span("server.probe_clients", clients=len(cids)):
+            with ThreadPoolExecutor(max_workers=min(32, len(cids))) as executor:
+                list(executor.map(probe, cids))
+
+    def _weights(self, cids):
+        stats = [self._stats_for(cid) for cid in cids]
+        known_sizes = [s["num_examples"] for s in stats if s["num_examples"]]
+        known_latencies = [s["fit_seconds"] for s in stats if s["fit_seconds"]]
+        median_size = float(np.median(known_sizes)) if known_sizes else 1.0
+        median_latency = float(np.median(known_latencies)) if known_latencies else 1.0
+        min_participations = min(s["participations"] for s in stats)
+
+        weights = []
+        for s in stats:
+            size = s["num_examples"] or median_size
+            data_factor = math.log1p(size) / math.log1p(median_size) if median_size > 0 else 1.0
+            latency = s["fit_seconds"] or median_latency
+            speed_factor = 2.0 / (1.0 + latency / median_latency) if median_latency > 0 else 1.0
+            reliability_factor = 1.0 / (1.0 + s["failures"])
+            fairness_factor = 1.0 / (1.0 + s["participations"] - min_participations)
+            weights.append(max(data_factor * speed_factor * reliability_factor * fairness_factor, 1e-6))
+        weights = np.asarray(weights)
+        return weights / weights.sum()
+
+    def sample(self, num_clients, min_num_clients=None, criterion=None):
+        if min_num_clients is None:
+            min_num_clients = num_clients
+        if not self.wait_for(min_num_clients, timeout=self.wait_timeout):
+            print(f"Client sampling: fewer than {min_num_clients} client(s) connected after {self.wait_timeout}s; sampling from those available.")
+
+        available_cids = list(self.clients)
+        if criterion is not None:
+            available_cids = [cid for cid in available_cids if criterion.select(self.clients[cid])]
+
+        if self.probe_new_clients:
+            with self._stats_lock:
+                unknown = [cid for cid in available_cids if self._stats_for(cid)["trainable"] is None]
+            if unknown:
+                self._probe(unknown)
+                # Clients can drop out while being probed
+                available_cids = [cid for cid in available_cids if cid in self.clients]
+
+        with self._stats_lock:
+            eligible = [cid for cid in available_cids if self._stats_for(cid)["trainable"] is not False]
+            if not eligible:
+                print("Client sampling: no trainable clients available.")
+                return []
+            if len(eligible) < num_clients:
+                print(f"Client sampling: only {len(eligible)} trainable client(s) for {num_clients} requested; using all of them.")
+                num_clients = len(eligible)
+            chosen = self._rng.choice(len(eligible), size=num_clients, replace=False, p=self._weights(eligible))
+        return [self.clients[eligible[i]] for i in chosen]
+
+    def state(self):
+        """Serializable stats, stored in round checkpoints."""
+        # Every client that ever identified itself is kept, connected or not, so fairness
+        # survives resumes and reconnects; only provisional cid-keyed entries are left out
+        with self._stats_lock:
+            return {key: dict(stats) for key, stats in self.client_stats.items() if key in self._known_client_ids}
+
+    def load_state(self, state):
+        with self._stats_lock:
+            for client_id, stats in (state or {}).items():
+                self.client_stats[client_id] = dict(_new_stats(), **stats)
+                self._known_client_ids.add(client_id)
+
+
+class CapacityAwareFedAvg(CheckpointingFedAvg):
+    """
+    Checkpointing FedAvg that samples clients_per_round clients through a
+    CapacityAwareClientManager and feeds fit results and failures back to it.
+    Updates from clients that could not train are dropped before averaging.
+    """
+
+    def __init__(self, client_manager, clients_per_round, **kwargs):
+        kwargs["min_fit_clients"] = clients_per_round
+        kwargs["min_evaluate_clients"] = clients_per_round
+        super().__init__(**kwargs)
+        self.client_manager = client_manager
+        self.clients_per_round = clients_per_round
+
+    def num_fit_clients(self, num_available_clients):
+        """Samples clients_per_round clients for training, whatever the fleet size."""
+        return self.clients_per_round, self.min_available_clients
+
+    def num_evaluation_clients(self, num_available_clients):
+        """Samples clients_per_round clients for federated evaluation, whatever the fleet size."""
+        return self.clients_per_round, self.min_available_clients
+
+    def strategy_state(self):
+        state = super().strategy_state()
+        state["client_stats"] = self.client_manager.state()
+        return state
+
+    def aggregate_fit(self, server_round, results, failures):
+        for client, fit_res in results:
+            if fit_res.num_examples == 0 and "trainable" not in fit_res.metrics:
+                # Empty update without a trainability report (e.g. an edge whose region produced
+                # nothing this round): a transient failure, not a reason to stop sampling the client
+                self.client_manager.record_failure(client.cid, fit_res.metrics)
+            else:
+                self.client_manager.record_fit_result(client.cid, fit_res.num_examples, fit_res.metrics)
+        for failure in failures:
+            if isinstance(failure, tuple):
+                self.client_manager.record_failure(failure[0].cid)
+        usable = drop_empty_updates(results)
+        if len(usable) < len(results):
+            print(f"Round {self.global_round(server_round)}: ignoring {len(results) - len(usable)} empty update(s).")
+        return super().aggregate_fit(server_round, usable, failures)
@@ -0,0 +1,162 @@
+import argparse
+import os
+import sys
+import time
+
+import flwr as fl
+from flwr.common import GetParametersIns, ndarrays_to_parameters, parameters_to_ndarrays
+
+try:
+    from flwr.server.superlink.fleet.grpc_bidi.grpc_server import start_grpc_server
+except ImportError:  # flwr < 1.8
+    from flwr.server.grpc_server.grpc_server import start_grpc_server
+
+# Add parent directory to path to import common and server_logic modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common import tracing
+from common.tracing import span
+from common.audit_log import audit_event
+from server_logic.client_sampling import CapacityAwareClientManager, drop_empty_updates
+
+DEFAULT_ROOT_ADDRESS = "127.0.0.1:8080"
+DEFAULT_ROUND_TIMEOUT = 600.0
+
+
+class RegionalFedAvg(fl.server.strategy.FedAvg):
+    """FedAvg for one region: forwards the root's round config and ignores empty updates."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.upstream_config = {}
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        instructions = super().configure_fit(server_round, parameters, client_manager)
+        for _, fit_ins in instructions:
+            fit_ins.config.update(self.upstream_config)
+        return instructions
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        instructions = super().configure_evaluate(server_round, parameters, client_manager)
+        for _, evaluate_ins in instructions:
+            evaluate_ins.config.update(self.upstream_config)
+        return instructions
+
+    def aggregate_fit(self, server_round, results, failures):
+        return super().aggregate_fit(server_round, drop_empty_updates(results), failures)
+
+
+class EdgeAggregator(fl.client.NumPyClient):
+    """
+    Intermediate aggregator for one region. Towards its regional clients it is
+    a Flower server; towards the root server it is a single Flower client.
+
+    Each root round, fit() runs one regional FedAvg round and returns the
+    example-weighted regional average with the region's total example count.
+    The root's FedAvg over those partial averages is therefore the same as a
+    flat FedAvg over every client, while the root only sees one connection
+    and one update per region.
+    """
+
+    def __init__(self, region_id, listen_address, num_clients, round_timeout=DEFAULT_ROUND_TIMEOUT, min_available=1):
+        self.region_id = region_id
+        self.num_clients = num_clients
+        self.min_available = min_available
+        self.round_timeout = round_timeout
+        # Regional rounds train whoever is connected; waiting for missing clients is bounded by the round timeout
+        self.client_manager = CapacityAwareClientManager(wait_timeout=round_timeout or 86400)
+        self.strategy = RegionalFedAvg(
+            fraction_fit=1.0,
+            fraction_evaluate=1.0,
+            min_fit_clients=min_available,
+            min_evaluate_clients=min_available,
+            min_available_clients=min_available,
+        )
+        self.server = fl.server.Server(client_manager=self.client_manager, strategy=self.strategy)
+        self.grpc_server = start_grpc_server(client_manager=self.client_manager, server_address=listen_address)
+        print(f"Edge {region_id}: accepting regional clients on {listen_address}.")
+
+    def _set_round(self, parameters, config):
+        self.strategy.upstream_config = dict(config)
+        self.server.parameters = ndarrays_to_parameters(parameters)
+        server_round = int(config.get("round", 0))
+        tracing.set_context(client_id=f"edge_{self.region_id}", round=server_round)
+        return server_round
+
+    def get_properties(self, config):
+        return {
+            "client_id": f"edge_{self.region_id}",
+            "num_examples": sum(stats["num_examples"] or 0 for stats in self.client_manager.client_stats.values()),
+            "trainable": 1,
+        }
+
+    def get_parameters(self, config):
+        # The root asks one client for initial parameters; relay to a regional client
+        clients = self.client_manager.sample(1)
+        if not clients:
+            raise RuntimeError(f"Edge {self.region_id}: no regional client connected to provide initial parameters.")
+        client = clients[0]
+        ins = GetParametersIns(config=dict(config))
+        try:
+            res = client.get_parameters(ins, timeout=self.round_timeout, group_id=None)
+        except TypeError:
+            # flwr < 1.6 has no group_id argument
+            res = client.get_parameters(ins, timeout=self.round_timeout)
+        return parameters_to_ndarrays(res.parameters)
+
+    def fit(self, parameters, config):
+        server_round = self._set_round(parameters, config)
+        started = time.perf_counter()
+        with span("edge.fit_round", region=self.region_id):
+            result = self.server.fit_round(server_round=server_round, timeout=self.round_timeout)
+        metrics = {"client_id": f"edge_{self.region_id}", "fit_seconds": time.perf_counter() - started}
+        if result is None or result[0] is None:
+            # No "trainable" flag: an empty regional round is transient and counts as a failure at the root
+            print(f"Edge {self.region_id}: no regional updates in round {server_round}.")
+            return [], 0, metrics
+        aggregated, _, (results, failures) = result
+        usable = drop_empty_updates(results)
+        num_examples = sum(fit_res.num_examples for _, fit_res in usable)
+        print(f"Edge {self.region_id}: round {server_round} aggregated {len(usable)} client update(s) ({len(failures)} failure(s)).")
+        audit_event("fl.aggregate", actor=f"edge_{self.region_id}", round=server_round, num_results=len(usable), num_failures=len(failures))
+        metrics.update({"trainable": 1, "regional_clients": len(usable)})
+        return parameters_to_ndarrays(aggregated), num_examples, metrics
+
+    def evaluate(self, parameters, config):
+        server_round = self._set_round(parameters, config)
+        with span("edge.evaluate_round", region=self.region_id):
+            result = self.server.evaluate_round(server_round=server_round, timeout=self.round_timeout)
+        if result is None or result[0] is None:
+            return 0.0, 0, {}
+        loss, metrics, (results, _) = result
+        num_examples = sum(evaluate_res.num_examples for _, evaluate_res in results)
+        return float(loss), num_examples, dict(metrics)
+
+    def shutdown(self):
+        self.server.disconnect_all_clients(timeout=self.round_timeout)
+        self.grpc_server.stop(grace=1)
+
+
+def start_edge_aggregator(region_id, listen_address, num_clients, root_address=DEFAULT_ROOT_ADDRESS, round_timeout=DEFAULT_ROUND_TIMEOUT, min_available=1):
+    tracing.set_process_name(f"edge_{region_id}")
+    edge = EdgeAggregator(region_id, listen_address, num_clients, round_timeout, min_available)
+    # Only join the federation once the region is ready, so the root never waits on an empty region
+    edge.client_manager.wait_for(num_clients)
+    print(f"Edge {region_id}: {num_clients} regional client(s) connected; joining root server at {root_address}.")
+    try:
+        fl.client.start_client(server_address=root_address, client=edge)
+    finally:
+        edge.shutdown()
+    print(f"Edge {region_id}: root federation finished.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guardian AI regional edge aggregator.")
+    parser.add_argument("region_id")
+    parser.add_argument("--listen", default="0.0.0.0:8081", help="Address regional clients connect to.")
+    parser.add_argument("--root", default=DEFAULT_ROOT_ADDRESS, help="Root FL server address.")
+    parser.add_argument("--clients", type=int, default=3, help="Regional clients to wait for before joining the root server.")
+    parser.add_argument("--min-available", type=int, default=1, help="Connected regional clients a round waits for; every connected client trains.")
+    parser.add_argument("--round-timeout", type=float, default=DEFAULT_ROUND_TIMEOUT, help="Seconds a regional round waits for clients and their updates.")
+    args = parser.parse_args()
+    start_edge_aggregator(args.region_id, args.listen, args.clients, args.root, args.round_timeout, args.min_available)
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.stats import rankdata
+
+# Add parent directory to path to import common and server_logic modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.model_definition import GLOBAL_TEXT_VECTORIZER, score_linear
+from common.tracing import span
+
+DEFAULT_EVAL_CHUNK_SIZE = 65_536
+_LOG_LOSS_EPS = 1e-15
+
+
+def _vectorizer_fingerprint(vectorizer):
+    """Hash of the vocabulary and IDF weights, so cached features are rebuilt if either changes."""
+    digest = hashlib.sha256()
+    for term, index in sorted(vectorizer.vocabulary_.items()):
+        digest.update(f"{term}:{index};".encode("utf-8"))
+    digest.update(np.asarray(vectorizer.idf_, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def feature_cache_path(test_data_path):
+    return os.path.splitext(test_data_path)[0] + "_features.npz"
+
+
+def load_eval_features(test_data_path, vectorizer=GLOBAL_TEXT_VECTORIZER):
+    """
+    Returns (X, y) for the public test set: X as a CSR matrix in the shared
+    client feature space, y as 0/1 (1 = non-compliant). Featurization runs once
+    per test file; the result is cached next to the CSV and reused as long as
+    the CSV and the vectorizer are unchanged.
+    """
+    stat = os.stat(test_data_path)
+    source_key = f"{stat.st_size}:{stat.st_mtime_ns}:{_vectorizer_fingerprint(vectorizer)}"
+    cache_path = feature_cache_path(test_data_path)
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["source_key"]) == source_key:
+                X = sp.csr_matrix((cached["data"], cached["indices"], cached["indptr"]), shape=tuple(cached["shape"]))
+                return X, cached["y"]
+
+    with span("server.featurize_eval_set"):
+        test_df = pd.read_csv(test_data_path, usecols=["text", "true_compliance_status"])
+        X = vectorizer.transform(test_df["text"]).tocsr()
+        y = (test_df["true_compliance_status"] == "non_compliant").to_numpy(dtype=np.int8) # 1 for non-compliant
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, data=X.data, indices=X.indices, indptr=X.indptr, shape=np.array(X.shape), y=y, source_key=np.array(source_key))
+    os.replace(tmp_path, cache_path)
+    return X, y
+
+
+def score_in_chunks(X, coef, intercept, chunk_size=DEFAULT_EVAL_CHUNK_SIZE):
+    """Non-compliance probabilities for every row of X, one sparse matrix-vector product per chunk."""
+    scores = np.empty(X.shape[0], dtype=np.float64)
+    for start in range(0, X.shape[0], chunk_size):
+        end = min(start + chunk_size, X.shape[0])
+        scores[start:end] = score_linear(X[start:end], coef, intercept)
+    return scores
+
+
+def compute_binary_metrics(y_true, scores):
+    """Accuracy, log-loss and ROC AUC from a single score vector (AUC is None if only one class)."""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    accuracy = float(np.mean((scores >= 0.5) == (y_true == 1)))
+    clipped = np.clip(scores, _LOG_LOSS_EPS, 1 - _LOG_LOSS_EPS)
+    log_loss = float(-np.mean(y_true * np.log(clipped) + (1 - y_true) * np.log1p(-clipped)))
+    num_pos = int(y_true.sum())
+    num_neg = len(y_true) - num_pos
+    auc = None
+    if num_pos and num_neg:
+        # Mann-Whitney U: probability a random positive outranks a random negative (ties count half)
+        ranks = rankdata(scores)
+        auc = float((ranks[y_true == 1].sum() - num_pos * (num_pos + 1) / 2) / (num_pos * num_neg))
+    return {"accuracy": accuracy, "log_loss": log_loss, "auc": auc}
+
+
+class EvalSchedule:
+    """
+    Decides which rounds get a server-side evaluation: every `every_rounds`
+    rounds, or whenever `every_seconds` have passed since the last one, and
+    always the final round.
+    """
+
+    def __init__(self, every_rounds=1, every_seconds=None, final_round=None, start_round=0):
+        self.every_rounds = every_rounds
+        self.every_seconds = every_seconds
+        self.final_round = final_round
+        self.last_round = start_round
+        self.last_time = time.monotonic()
+
+    def due(self, server_round):
+        if server_round <= 0:
+            return False
+        is_due = (
+            server_round == self.final_round
+            or (self.every_rounds and server_round - self.last_round >= self.every_rounds)
+            or (self.every_seconds is not None and time.monotonic() - self.last_time >= self.every_seconds)
+        )
+        if is_due:
+            self.last_round = server_round
+            self.last_time = time.monotonic()
+        return bool(is_due)
@@ -1,8 +1,6 @@
+import argparse
 import flwr as fl
-import numpy as np
 import pandas as pd
-from sklearn.metrics import accuracy_score
-from sklearn.feature_extraction.text import TfidfVectorizer
 import sys
 import os
 import wandb
@@ -12,83 +10,123 @@ import time
 # Add parent directory to path to import common and client_logic modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from common.model_definition import TextComplianceModel
+from common import tracing
+from common.tracing import span
+from common.audit_log import audit_event
+from common.model_definition import split_flat_parameters
 from client_logic.he_utils import generate_global_paillier_keys, decrypt_value, homomorphic_add_values, public_key_global, private_key_global
 from client_logic.data_generator import generate_synthetic_text_data, save_client_data_locally
+from server_logic.checkpoint import CheckpointWriter, resume_state, latest_run_dir, new_run_dir, DEFAULT_CHECKPOINT_DIR
+from server_logic.client_sampling import CapacityAwareClientManager, CapacityAwareFedAvg
+from server_logic.evaluation import load_eval_features, score_in_chunks, compute_binary_metrics, EvalSchedule
 
 # Ensure keys are generated (or retrieved from global scope)
 public_key, private_key = generate_global_paillier_keys()
 
 # Define a simple evaluation function for the server
-def get_eval_fn(test_data_path):
+def get_eval_fn(test_data_path, num_rounds=None, eval_every_rounds=1, eval_every_seconds=None, start_round=0):
     """
     Returns a function that evaluates the global model on a public, non-sensitive test set.
     This simulates a public dataset used for overall model validation without client data access.
+    The test set is featurized once (and cached on disk) in the clients' feature space and scored
+    in chunks; rounds not selected by the eval cadence are skipped.
     """
-    # Load or generate a small, separate test dataset for server evaluation.
-    test_df = pd.read_csv(test_data_path)
-
-    # Create a TF-IDF vectorizer that matches the client's feature space.
-    test_vectorizer = TfidfVectorizer(max_features=100)
-    common_phrases = [
-        "terms conditions explained", "privacy policy understood", "no personal details",
-        "bank account number requested", "shared customer data", "aggressive sales",
-        "security protocol bypassed", "unencrypted log", "opt out options",
-        "test sentence for compliance audit"
-    ]
-    test_vectorizer.fit(common_phrases + test_df['text'].tolist())
-
-    X_test = test_vectorizer.transform(test_df['text']).toarray()
-    y_test = (test_df['true_compliance_status'] == 'non_compliant').astype(int) # 1 for non-compliant
-
-    # Initialize the global model once for evaluation purposes
-    global_model_evaluator = TextComplianceModel()
+    X_test, y_test = load_eval_features(test_data_path)
+    schedule = EvalSchedule(eval_every_rounds, eval_every_seconds, final_round=num_rounds, start_round=start_round)
 
     def evaluate(server_round, parameters, config):
-        # Set the global model's parameters for evaluation
-        num_features = X_test.shape[1]
+        tracing.set_context(client_id="server", round=server_round)
         if not parameters: return 1.0, {"accuracy": 0.0}
-        coef = np.array(parameters[:num_features]).reshape(1, -1)
-        intercept = np.array(parameters[num_features:])
-        global_model_evaluator.set_parameters({'coef': coef, 'intercept': intercept})
-
-        preds = global_model_evaluator.predict(X_test)
-        accuracy = accuracy_score(y_test, preds)
-        loss = 1 - accuracy
+        if not schedule.due(server_round):
+            return None
+        with span("server.evaluate", rows=X_test.shape[0]):
+            coef, intercept = split_flat_parameters(parameters, X_test.shape[1])
+            scores = score_in_chunks(X_test, coef, intercept)
+            metrics = compute_binary_metrics(y_test, scores)
 
         wandb.log({
-            "server_round_accuracy": accuracy,
-            "server_round_loss": loss,
+            "server_round_accuracy": metrics["accuracy"],
+            "server_round_loss": metrics["log_loss"],
+            "server_round_auc": metrics["auc"],
             "round": server_round
         })
-        print(f"Server Round {server_round} Global Accuracy (on public test set): {accuracy:.4f}")
-        return float(loss), {"accuracy": float(accuracy)}
+        auc_text = f"{metrics['auc']:.4f}" if metrics["auc"] is not None else "n/a"
+        print(f"Server Round {server_round} Global Accuracy (on public test set, {X_test.shape[0]} rows): {metrics['accuracy']:.4f} | log-loss {metrics['log_loss']:.4f} | AUC {auc_text}")
+        return metrics["log_loss"], {key: float(value) for key, value in metrics.items() if value is not None}
     return evaluate
 
-def start_fl_server_main(num_rounds=3, num_clients=3):
+def round_config(server_round):
+    """Per-round config sent to clients so their logs and trace spans carry the round number."""
+    return {"round": server_round}
+
+def start_fl_server_main(num_rounds=3, num_clients=3, resume=False, checkpoint_dir=DEFAULT_CHECKPOINT_DIR, clients_per_round=None,
+                         eval_every_rounds=1, eval_every_seconds=None, eval_rows=5000, min_available=None):
     print("Starting Flower FL Server...")
-    server_test_df = generate_synthetic_text_data(num_records=20, client_id="server_public_test", compliance_ratio=0.7)
+    tracing.set_process_name("fl_server")
+    initial_parameters, completed_rounds, metrics_history, strategy_state = None, 0, [], {}
+    # A resumed run keeps writing to the run it continues; a fresh run gets its own directory
+    run_dir = latest_run_dir(checkpoint_dir) if resume else None
+    if run_dir is not None:
+        initial_parameters, completed_rounds, metrics_history, strategy_state = resume_state(run_dir)
+    else:
+        if resume:
+            print(f"No checkpoint found in {checkpoint_dir}; starting from scratch.")
+        run_dir = new_run_dir(checkpoint_dir)
+        print(f"Writing checkpoints for this run to {run_dir} (restart with --resume to continue it).")
+    remaining_rounds = num_rounds - completed_rounds
+    if remaining_rounds <= 0:
+        print(f"All {num_rounds} rounds already completed according to {run_dir}; nothing to do.")
+        return
     test_data_path = os.path.join("data", "synthetic", "server_public_test_text.csv")
-    server_test_df.to_csv(test_data_path, index=False)
-    print(f"Server public test data generated at: {test_data_path}")
+    existing_rows = len(pd.read_csv(test_data_path, usecols=["true_compliance_status"])) if os.path.exists(test_data_path) else None
+    if existing_rows == eval_rows:
+        print(f"Reusing server public test data ({existing_rows} rows) at: {test_data_path}")
+    else:
+        if existing_rows is not None:
+            print(f"Existing server public test data has {existing_rows} rows, --eval-rows asks for {eval_rows}; regenerating.")
+        os.makedirs(os.path.dirname(test_data_path), exist_ok=True)
+        server_test_df = generate_synthetic_text_data(num_records=eval_rows, client_id="server_public_test", compliance_ratio=0.7)
+        server_test_df.to_csv(test_data_path, index=False)
+        print(f"Server public test data generated at: {test_data_path}")
 
     wandb.init(project="guardian-ai-fl", name="fl-server-run", reinit=True)
     print("FL Server W&B initialized.")
 
-    strategy = fl.server.strategy.FedAvg(
-        fraction_fit=1.0,
-        fraction_evaluate=1.0,
-        min_fit_clients=num_clients,
-        min_evaluate_clients=num_clients,
-        min_available_clients=num_clients,
-        evaluate_fn=get_eval_fn(test_data_path),
+    # Train on a fixed-size sample each round so server work stays constant as the fleet grows
+    clients_per_round = min(clients_per_round or num_clients, num_clients)
+    # Rounds only wait for enough connected clients to fill a sample, not for the whole fleet
+    min_available = min_available or clients_per_round
+    client_manager = CapacityAwareClientManager()
+    client_manager.load_state(strategy_state.get("client_stats"))
+    checkpoint_writer = CheckpointWriter(run_dir)
+    strategy = CapacityAwareFedAvg(
+        client_manager=client_manager,
+        clients_per_round=clients_per_round,
+        checkpoint_writer=checkpoint_writer,
+        round_offset=completed_rounds,
+        metrics_history=metrics_history,
+        initial_parameters=initial_parameters,
+        min_available_clients=min_available,
+        evaluate_fn=get_eval_fn(
+            test_data_path,
+            num_rounds=num_rounds,
+            eval_every_rounds=eval_every_rounds,
+            eval_every_seconds=eval_every_seconds,
+            start_round=completed_rounds,
+        ),
+        on_fit_config_fn=round_config,
+        on_evaluate_config_fn=round_config,
     )
 
-    fl.server.start_server(
-        server_address="0.0.0.0:8080",
-        config=fl.server.ServerConfig(num_rounds=num_rounds),
-        strategy=strategy,
-    )
+    try:
+        fl.server.start_server(
+            server_address="0.0.0.0:8080",
+            config=fl.server.ServerConfig(num_rounds=remaining_rounds),
+            strategy=strategy,
+            client_manager=client_manager,
+        )
+    finally:
+        checkpoint_writer.close()
     wandb.finish()
 
     print("\n--- Demonstrating Conceptual Homomorphic Aggregation on Server ---")
@@ -99,14 +137,43 @@ def start_fl_server_main(num_rounds=3, num_clients=3):
         print(f"Simulated: Received encrypted risk score from client {i+1} (encrypted, not shown)")
 
     if client_encrypted_risks:
-        total_encrypted_risk = client_encrypted_risks[0]
-        for i in range(1, len(client_encrypted_risks)):
-            total_encrypted_risk = homomorphic_add_values(total_encrypted_risk, client_encrypted_risks[i])
+        tracing.set_context(client_id="server", round=num_rounds)
+        with span("server.he_aggregate", clients=len(client_encrypted_risks)):
+            total_encrypted_risk = client_encrypted_risks[0]
+            for i in range(1, len(client_encrypted_risks)):
+                total_encrypted_risk = homomorphic_add_values(total_encrypted_risk, client_encrypted_risks[i])
+        audit_event("he.aggregate", actor="fl_server", num_ciphertexts=len(client_encrypted_risks))
         decrypted_total_risk = decrypt_value(total_encrypted_risk, private_key_global)
+        audit_event("he.decrypt", actor="fl_server", value="aggregated_network_risk")
         print(f"\nAggregated (Decrypted) Total Network Risk Score: {decrypted_total_risk:.4f}")
         print("This demonstrates that sensitive insights can be aggregated homomorphically across clients without decrypting individual contributions.")
     else:
         print("No encrypted insights to aggregate (check client setup).")
 
+    if tracing.is_enabled():
+        print("\n--- Per-Round Trace Summary ---")
+        print(tracing.format_round_summary())
+
 if __name__ == "__main__":
-    start_fl_server_main(num_rounds=3, num_clients=3)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Guardian AI Flower FL server.")
+    parser.add_argument("--rounds", type=int, default=3, help="Total number of FL rounds (including resumed ones).")
+    parser.add_argument("--clients", type=int, default=3, help="Expected fleet size; caps --clients-per-round.")
+    parser.add_argument("--clients-per-round", type=int, default=None, help="Clients sampled to train each round (default: --clients).")
+    parser.add_argument("--min-available", type=int, default=None, help="Connected clients a round waits for before sampling (default: --clients-per-round).")
+    parser.add_argument("--resume", action="store_true", help="Continue the latest run in --checkpoint-dir from its last checkpoint.")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR, help="Each run writes its checkpoints to its own run_<timestamp> subdirectory.")
+    parser.add_argument("--eval-every-rounds", type=int, default=1, help="Evaluate the global model every N rounds (the final round is always evaluated).")
+    parser.add_argument("--eval-every-seconds", type=float, default=None, help="Also evaluate once this many seconds have passed since the last evaluation.")
+    parser.add_argument("--eval-rows", type=int, default=5000, help="Size of the public test set; regenerated if the existing file has a different row count.")
+    args = parser.parse_args()
+    start_fl_server_main(
+        num_rounds=args.rounds,
+        num_clients=args.clients,
+        resume=args.resume,
+        checkpoint_dir=args.checkpoint_dir,
+        clients_per_round=args.clients_per_round,
+        eval_every_rounds=args.eval_every_rounds,
+        eval_every_seconds=args.eval_every_seconds,
+        eval_rows=args.eval_rows,
+        min_available=args.min_available,
+    )
\ No newline at end of file
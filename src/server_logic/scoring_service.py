@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+# Add parent directory to path to import common modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.model_definition import GLOBAL_TEXT_VECTORIZER, score_linear, split_flat_parameters
+from common.tracing import span
+
+
+def load_global_parameters(path):
+    """
+    Loads global text-model parameters saved as JSON ({"coef": [...], "intercept": [...]})
+    or .npz (arrays "coef" and "intercept"). Returns (coef, intercept) as numpy arrays.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return np.asarray(data["coef"], dtype=np.float64).ravel(), np.asarray(data["intercept"], dtype=np.float64).ravel()
+    with open(path) as f:
+        params = json.load(f)
+    return np.asarray(params["coef"], dtype=np.float64).ravel(), np.asarray(params["intercept"], dtype=np.float64).ravel()
+
+
+class ComplianceScorer:
+    """Stateless batch scorer: TF-IDF featurization plus one sparse dot product per batch."""
+
+    def __init__(self, coef, intercept, vectorizer=GLOBAL_TEXT_VECTORIZER):
+        self.vectorizer = vectorizer
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = np.asarray(intercept, dtype=np.float64).ravel()
+        num_features = len(vectorizer.vocabulary_)
+        if self.coef.shape[0] != num_features:
+            raise ValueError(f"Model has {self.coef.shape[0]} coefficients but the vectorizer produces {num_features} features.")
+
+    @classmethod
+    def from_file(cls, path, vectorizer=GLOBAL_TEXT_VECTORIZER):
+        coef, intercept = load_global_parameters(path)
+        return cls(coef, intercept, vectorizer)
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_dir, vectorizer=GLOBAL_TEXT_VECTORIZER):
+        """Builds a scorer from the latest FL round checkpoint (see server_logic.checkpoint)."""
+        from server_logic.checkpoint import load_latest_checkpoint
+        checkpoint = load_latest_checkpoint(checkpoint_dir)
+        if checkpoint is None:
+            raise FileNotFoundError(f"No checkpoint found in {checkpoint_dir}")
+        flat = np.concatenate([np.ravel(p) for p in checkpoint["parameters"]])
+        return cls.from_flat_parameters(flat, vectorizer)
+
+    @classmethod
+    def from_flat_parameters(cls, parameters, vectorizer=GLOBAL_TEXT_VECTORIZER):
+        coef, intercept = split_flat_parameters(parameters, len(vectorizer.vocabulary_))
+        return cls(coef, intercept, vectorizer)
+
+    def score_batch(self, texts):
+        """Returns the non-compliance probability for each text, kept sparse end to end."""
+        with span("scoring.batch", size=len(texts)):
+            X = self.vectorizer.transform(texts)
+            return score_linear(X, self.coef, self.intercept)
+
+
+class MicroBatchScoringService:
+    """
+    Local async scoring API. Concurrent score() calls are queued and grouped into
+    micro-batches of up to max_batch_size texts, or whatever arrived within
+    max_wait_ms of the first queued request, then scored in one vectorized call
+    on a worker thread so the event loop keeps accepting requests.
+    """
+
+    def __init__(self, scorer, max_batch_size=256, max_wait_ms=5.0, latency_window=100_000):
+        self.scorer = scorer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._worker = None
+        self._in_flight = []
+        self._latencies = deque(maxlen=latency_window)
+        self._scored = 0
+        self._batches = 0
+        self._started_at = None
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._started_at = time.perf_counter()
+            self._worker = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        """Stops the worker. Requests still queued or in the batch being scored fail with RuntimeError."""
+        if self._worker is None:
+            return
+        worker, self._worker = self._worker, None  # score() rejects new requests from here on
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+        pending = self._in_flight
+        self._in_flight = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Scoring service stopped before the request was scored."))
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def score(self, text):
+        """Scores one text; resolves once its micro-batch has been processed."""
+        if self._worker is None:
+            raise RuntimeError("Scoring service is not started; call start() or use 'async with'.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def score_many(self, texts):
+        return await asyncio.gather(*(self.score(text) for text in texts))
+
+    async def _collect_batch(self):
+        # Collected straight into _in_flight so stop() can fail a half-collected batch too
+        batch = self._in_flight = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued without yielding to the loop
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - time.perf_counter()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for text, _, _ in batch]
+            try:
+                scores = await loop.run_in_executor(None, self.scorer.score_batch, texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._in_flight = []
+                continue
+            done_at = time.perf_counter()
+            for (_, future, enqueued_at), score in zip(batch, scores):
+                if not future.done():
+                    future.set_result(float(score))
+                self._latencies.append(done_at - enqueued_at)
+            self._in_flight = []
+            self._scored += len(batch)
+            self._batches += 1
+
+    def stats(self):
+        """Latency percentiles (over the recent window) and overall throughput."""
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        latencies_ms = np.asarray(self._latencies) * 1000.0
+        return {
+            "scored": self._scored,
+            "batches": self._batches,
+            "mean_batch_size": self._scored / self._batches if self._batches else 0.0,
+            "throughput_per_s": self._scored / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": float(np.percentile(latencies_ms, 50)) if latencies_ms.size else None,
+            "p99_ms": float(np.percentile(latencies_ms, 99)) if latencies_ms.size else None,
+        }
+
+
+async def _demo(scorer, num_messages, concurrency):
+    from client_logic.data_generator import generate_synthetic_text_data
+    texts = generate_synthetic_text_data(num_records=500, client_id="scoring_demo")['text'].tolist()
+    async with MicroBatchScoringService(scorer) as service:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with semaphore:
+                return await service.score(texts[i % len(texts)])
+
+        scores = await asyncio.gather(*(one(i) for i in range(num_messages)))
+        stats = service.stats()
+    print(f"Scored {len(scores)} messages; mean non-compliance risk = {np.mean(scores):.4f}")
+    print(f"Throughput: {stats['throughput_per_s']:.0f} msg/s | p50 {stats['p50_ms']:.2f} ms | p99 {stats['p99_ms']:.2f} ms | mean batch {stats['mean_batch_size']:.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python scoring_service.py <global_params.json|.npz|checkpoint_dir> [num_messages] [concurrency]")
+        sys.exit(1)
+    num_messages = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 1_000
+    source = sys.argv[1]
+    scorer = ComplianceScorer.from_checkpoint(source) if os.path.isdir(source) else ComplianceScorer.from_file(source)
+    asyncio.run(_demo(scorer, num_messages, concurrency))
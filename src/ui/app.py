@@ -13,6 +13,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from client_logic.data_generator import generate_synthetic_text_data, generate_synthetic_image_data, generate_synthetic_sensor_data, save_client_data_locally
 from client_logic.he_utils import generate_global_paillier_keys, encrypt_value, decrypt_value, homomorphic_add_values
 from client_logic.local_model import get_local_insights
+from common.audit_log import audit_event, get_audit_log, query_events, count_events, distinct_values, verify_chain
 
 if 'public_key' not in st.session_state or 'private_key' not in st.session_state:
     st.session_state.public_key, st.session_state.private_key = generate_global_paillier_keys()
@@ -69,6 +70,7 @@ elif page_selection == "Layered Architecture Demo":
                 image_data = generate_synthetic_image_data(5, client_id)
                 sensor_df = generate_synthetic_sensor_data(100, client_id)
                 save_client_data_locally(client_id, text_df, image_data, sensor_df)
+                audit_event("data.generated", client_id=client_id, actor="ui", text_rows=len(text_df), sensor_rows=len(sensor_df))
             st.success("Synthetic data generated for clients A, B, C locally (not committed to Git).")
             st.write("""
             *(The raw sensitive data conceptually stays within each client's secure enclave.)*
@@ -125,6 +127,7 @@ elif page_selection == "Layered Architecture Demo":
                     enc_sum = homomorphic_add_values(enc_val1, enc_val2)
                     st.write(f"Encrypted Sum (on server): `{enc_sum}`")
                     dec_sum = decrypt_value(enc_sum, st.session_state.private_key)
+                    audit_event("he.decrypt", actor="AuditorUser", value="he_demo_sum")
                     st.write(f"Decrypted Sum: `{dec_sum}` (Expected: {he_val1 + he_val2})")
                     st.success("HE operation successful! Shows computation without decryption.")
 
@@ -152,7 +155,7 @@ elif page_selection == "Layered Architecture Demo":
 
     st.subheader("4. Layer 3: Decrypted & Auditable Insights")
     st.markdown("""
-    *Only authorized personnel can decrypt and view high-level, actionable insights. Every decryption event is logged conceptually, ensuring full auditability and compliance.*
+    *Only authorized personnel can decrypt and view high-level, actionable insights. Every decryption event is recorded in the hash-chained audit log (see the Audit Trail below), ensuring full auditability and compliance.*
     """)
     st.subheader("Simulated Aggregated Insight Decryption")
     st.markdown("""
@@ -164,6 +167,7 @@ elif page_selection == "Layered Architecture Demo":
             simulated_encrypted_aggregated_score = st.session_state.public_key.encrypt(simulated_total_risk)
             st.write(f"Simulated Encrypted Aggregated Score: `{simulated_encrypted_aggregated_score}`")
             decrypted_score = decrypt_value(simulated_encrypted_aggregated_score, st.session_state.private_key)
+            audit_event("he.decrypt", actor="AuditorUser", value="aggregated_network_risk")
             st.success(f"**Decrypted Global Network Risk Score: {decrypted_score:.4f}**")
             st.write("""
             *This demonstrates that insights can be derived and aggregated while remaining encrypted,
@@ -177,20 +181,53 @@ elif page_selection == "Layered Architecture Demo":
             """)
         else:
             st.error("Global Paillier keys not initialized. Please refresh the page or restart the app.")
-    st.subheader("Audit Trail (Conceptual)")
+    st.subheader("Audit Trail")
     st.markdown("""
-    *Every sensitive operation and decryption event is logged for compliance and accountability.*
-    """)
-    st.code("""
-    [2025-07-30 22:30:01] Client_A: Raw data generated.
-    [2025-07-30 22:30:02] Client_A: Features extracted. Compliance score encrypted.
-    [2025-07-30 22:30:05] Client_B: Raw data generated.
-    [2025-07-30 22:30:06] Client_B: Features extracted. Compliance score encrypted.
-    ...
-    [2025-07-30 22:31:10] FL Server: Received encrypted model updates from 3 clients.
-    [2025-07-30 22:31:15] FL Server: Performed homomorphic aggregation of model parameters.
-    [2025-07-30 22:32:00] UI: Decryption of aggregated risk score by 'AuditorUser'. Result: 0.X
+    *Every sensitive operation and decryption event is appended to a hash-chained, append-only audit log for compliance and accountability.*
     """)
+    # Commit this session's pending events before reading them back
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        audit_log.flush(timeout=2.0)
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    audit_client = filter_col1.selectbox("Client", ["All"] + distinct_values("client_id"), key="audit_client")
+    audit_type = filter_col2.selectbox("Event type", ["All"] + distinct_values("event_type"), key="audit_type")
+    audit_page_size = filter_col3.selectbox("Page size", [25, 50, 100], key="audit_page_size")
+    audit_filters = {
+        "client_id": None if audit_client == "All" else audit_client,
+        "event_type": None if audit_type == "All" else audit_type,
+    }
+    # Keyset pagination: remember the oldest seq of each page shown so far
+    if st.session_state.get("audit_filters") != audit_filters:
+        st.session_state.audit_filters = audit_filters
+        st.session_state.audit_cursors = [None]
+    audit_events = query_events(before_seq=st.session_state.audit_cursors[-1], limit=audit_page_size, **audit_filters)
+    st.caption(f"{count_events(**audit_filters)} matching event(s), page {len(st.session_state.audit_cursors)}.")
+    if audit_events:
+        st.dataframe(pd.DataFrame([{
+            "seq": e["seq"],
+            "time": pd.to_datetime(e["ts"], unit="s"),
+            "event": e["event_type"],
+            "client": e["client_id"],
+            "actor": e["actor"],
+            "details": e["details"],
+            "hash": e["hash"][:16],
+        } for e in audit_events]), use_container_width=True)
+    else:
+        st.info("No audit events recorded yet. Generate data or decrypt a score above to create some.")
+    nav_col1, nav_col2, nav_col3 = st.columns(3)
+    if nav_col1.button("Newer", disabled=len(st.session_state.audit_cursors) == 1):
+        st.session_state.audit_cursors.pop()
+        st.rerun()
+    if nav_col2.button("Older", disabled=len(audit_events) < audit_page_size):
+        st.session_state.audit_cursors.append(audit_events[-1]["seq"])
+        st.rerun()
+    if nav_col3.button("Verify Hash Chain"):
+        chain_ok, bad_seq = verify_chain()
+        if chain_ok:
+            st.success("Audit log hash chain verified: no events altered, removed or reordered.")
+        else:
+            st.error(f"Audit log tampering detected at event #{bad_seq}.")
 
 elif page_selection == "Zero-Trust Principles":
     st.header("Zero-Trust Principles in Guardian AI")